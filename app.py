@@ -16,9 +16,27 @@ from data_fetcher import (
     get_commodity_category,
     get_categories,
     get_commodities_by_category,
+    get_lookback_prices,
+    get_fetch_status,
+    get_commodity_unit,
+    is_synthetic,
     COMMODITY_MAP
 )
 
+def format_price(commodity, value):
+    """Format a price in the commodity's unit (ratios carry no currency)."""
+    if get_commodity_unit(commodity) == 'ratio':
+        return f"{value:,.4f}"
+    return f"¥{value:,.2f}"
+
+
+def format_change(commodity, value):
+    """Format an absolute change, signed, in the commodity's unit."""
+    if get_commodity_unit(commodity) == 'ratio':
+        return f"{value:+,.4f}"
+    return f"{value:+,.2f}"
+
+
 # Page configuration
 st.set_page_config(
     page_title="China Commodity Price Dashboard",
@@ -174,6 +192,17 @@ else:
 
 st.sidebar.markdown("---")
 st.sidebar.markdown("**Display Options**")
+series_options = {
+    'Main contract': 'none',
+    'Back-adjusted continuous': 'back',
+    'Ratio-adjusted continuous': 'ratio'
+}
+series_choice = st.sidebar.selectbox(
+    "Price Series",
+    list(series_options.keys()),
+    help="Continuous series remove roll gaps between delivery months; they fall back to the main contract until built"
+)
+adjustment = series_options[series_choice]
 show_statistics = st.sidebar.checkbox("Show Statistics", value=True)
 show_trends = st.sidebar.checkbox("Show Trend Analysis", value=False)
 moving_average_days = st.sidebar.slider("Moving Average Period (days)", 7, 90, 30)
@@ -190,11 +219,15 @@ data_container = st.container()
 all_data = {}
 with st.spinner("Fetching commodity price data..."):
     for commodity in selected_commodities:
-        df = fetch_commodity_data(commodity, start_date, end_date, use_cache=True)
+        df = fetch_commodity_data(commodity, start_date, end_date, use_cache=True, adjustment=adjustment)
         if not df.empty:
             all_data[commodity] = df
         else:
-            st.warning(f"⚠️ No data available for {commodity_display_names[commodity]}")
+            fetch_status = get_fetch_status(commodity)
+            if fetch_status:
+                st.info(f"⏸️ {commodity_display_names[commodity]}: {fetch_status}")
+            else:
+                st.warning(f"⚠️ No data available for {commodity_display_names[commodity]}")
 
 if not all_data:
     st.error("No data available for the selected commodities and date range.")
@@ -215,39 +248,14 @@ for commodity, df in all_data.items():
         current_price = prices.iloc[-1]
         current_date = dates.iloc[-1]
         
-        # Fetch extended historical data for comparison (go back 5+ years from current date)
-        extended_start_date = current_date - timedelta(days=365 * 6)  # 6 years to ensure we have 5 years
-        extended_df = fetch_commodity_data(commodity, extended_start_date, current_date, use_cache=True)
-        
-        # Use extended data if available, otherwise fall back to original df
-        comparison_df = extended_df if not extended_df.empty else df
-        
         # Get prices at different time points (1, 2, 3, 4, 5 years ago)
-        row_data = {'Commodity': display_name, 'Current': f"¥{current_price:,.2f}"}
-        
-        for years_back in range(1, 6):  # 1 to 5 years ago
-            target_date = current_date - timedelta(days=365 * years_back)
-            # Find closest date to target date (within ±30 days for flexibility)
-            historical_data = comparison_df[
-                (comparison_df['date'] >= target_date - timedelta(days=30)) &
-                (comparison_df['date'] <= target_date + timedelta(days=30))
-            ]
-            
-            if not historical_data.empty:
-                # Get the closest date to target
-                historical_data = historical_data.copy()
-                historical_data['date_diff'] = abs((historical_data['date'] - target_date).dt.days)
-                closest_row = historical_data.loc[historical_data['date_diff'].idxmin()]
-                historical_price = closest_row['price']
-                row_data[f'{years_back}Y Ago'] = f"¥{historical_price:,.2f}"
+        row_data = {'Commodity': display_name, 'Current': format_price(commodity, current_price)}
+        lookback = get_lookback_prices(commodity, current_date, fallback_df=df, adjustment=adjustment)
+        for years_back, historical_price in lookback.items():
+            if historical_price is not None:
+                row_data[f'{years_back}Y Ago'] = format_price(commodity, historical_price)
             else:
-                # Fallback: try to find any data before target date
-                fallback_data = comparison_df[comparison_df['date'] <= target_date]
-                if not fallback_data.empty:
-                    historical_price = fallback_data['price'].iloc[-1]
-                    row_data[f'{years_back}Y Ago'] = f"¥{historical_price:,.2f}"
-                else:
-                    row_data[f'{years_back}Y Ago'] = "N/A"
+                row_data[f'{years_back}Y Ago'] = "N/A"
         
         table_data.append(row_data)
 
@@ -266,6 +274,7 @@ colors = ['#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd', '#8c564b']
 for idx, (commodity, df) in enumerate(all_data.items()):
     color = colors[idx % len(colors)]
     display_name = commodity_display_names[commodity]
+    hover_value = '%{y:,.4f}' if get_commodity_unit(commodity) == 'ratio' else '¥%{y:,.2f} RMB'
     
     # Main price line
     fig.add_trace(go.Scatter(
@@ -276,7 +285,7 @@ for idx, (commodity, df) in enumerate(all_data.items()):
         line=dict(color=color, width=2),
         hovertemplate=f'<b>{display_name}</b><br>' +
                       'Date: %{x}<br>' +
-                      'Price: ¥%{y:,.2f} RMB<extra></extra>',
+                      f'Price: {hover_value}<extra></extra>',
         showlegend=True
     ))
     
@@ -316,7 +325,7 @@ for idx, (commodity, df) in enumerate(all_data.items()):
             opacity=0.6,
             hovertemplate=f'<b>{display_name} MA</b><br>' +
                           'Date: %{x}<br>' +
-                          'MA: ¥%{y:,.2f} RMB<extra></extra>',
+                          f'MA: {hover_value}<extra></extra>',
             showlegend=True
         ))
 
@@ -375,22 +384,30 @@ if show_statistics:
                     max_price = prices.max()
                     current_price = prices.iloc[-1]
                     first_price = prices.iloc[0]
-                    pct_change = ((current_price - first_price) / first_price) * 100
                     
                     # Volatility (standard deviation)
                     volatility = prices.std()
-                    volatility_pct = (volatility / avg_price) * 100
+                    
+                    # Spreads can be negative or near zero, so report absolute changes
+                    if is_synthetic(commodity):
+                        change_label = format_change(commodity, current_price - first_price)
+                        volatility_label = None
+                    else:
+                        pct_change = ((current_price - first_price) / first_price) * 100
+                        change_label = f"{pct_change:+.2f}%"
+                        volatility_pct = (volatility / avg_price) * 100
+                        volatility_label = f"{volatility_pct:.2f}%"
                     
                     # Display metrics
-                    st.metric("Current Price", f"¥{current_price:,.2f}", f"{pct_change:+.2f}%")
-                    st.metric("Average Price", f"¥{avg_price:,.2f}")
-                    st.metric("Min Price", f"¥{min_price:,.2f}")
-                    st.metric("Max Price", f"¥{max_price:,.2f}")
-                    st.metric("Volatility", f"¥{volatility:,.2f}", f"{volatility_pct:.2f}%")
+                    st.metric("Current Price", format_price(commodity, current_price), change_label)
+                    st.metric("Average Price", format_price(commodity, avg_price))
+                    st.metric("Min Price", format_price(commodity, min_price))
+                    st.metric("Max Price", format_price(commodity, max_price))
+                    st.metric("Volatility", format_price(commodity, volatility), volatility_label)
                     
                     # Price range
                     price_range = max_price - min_price
-                    st.metric("Price Range", f"¥{price_range:,.2f}")
+                    st.metric("Price Range", format_price(commodity, price_range))
 
 # Trend analysis
 if show_trends:
@@ -421,19 +438,35 @@ if show_trends:
                 
                 if len(df) >= 2:
                     prices = df['price']
+                    synthetic = is_synthetic(commodity)
                     
                     # Short-term trend (last 30 days vs previous 30 days)
                     if len(prices) >= 60:
                         recent_avg = prices.tail(30).mean()
                         previous_avg = prices.tail(60).head(30).mean()
-                        short_trend = ((recent_avg - previous_avg) / previous_avg) * 100
+                        if synthetic:
+                            short_trend = recent_avg - previous_avg
+                            short_label = format_change(commodity, short_trend)
+                        else:
+                            short_trend = ((recent_avg - previous_avg) / previous_avg) * 100
+                            short_label = f"{short_trend:+.2f}%"
                         trend_direction = "📈 Upward" if short_trend > 0 else "📉 Downward" if short_trend < 0 else "➡️ Stable"
-                        st.markdown(f"**Short-term Trend (30 days):** {trend_direction} ({short_trend:+.2f}%)")
+                        st.markdown(f"**Short-term Trend (30 days):** {trend_direction} ({short_label})")
                     
                     # Long-term trend (overall period)
-                    overall_trend = ((prices.iloc[-1] - prices.iloc[0]) / prices.iloc[0]) * 100
+                    if synthetic:
+                        overall_trend = prices.iloc[-1] - prices.iloc[0]
+                        overall_label = format_change(commodity, overall_trend)
+                    else:
+                        overall_trend = ((prices.iloc[-1] - prices.iloc[0]) / prices.iloc[0]) * 100
+                        overall_label = f"{overall_trend:+.2f}%"
                     trend_direction = "📈 Upward" if overall_trend > 0 else "📉 Downward" if overall_trend < 0 else "➡️ Stable"
-                    st.markdown(f"**Overall Trend:** {trend_direction} ({overall_trend:+.2f}%)")
+                    st.markdown(f"**Overall Trend:** {trend_direction} ({overall_label})")
+                    
+                    # Relative volatility is meaningless around zero; show the spread's standard deviation
+                    if synthetic:
+                        st.markdown(f"**Volatility:** {format_price(commodity, prices.std())} (std dev)")
+                        continue
                     
                     # Volatility indicator
                     volatility = prices.std() / prices.mean() * 100
@@ -0,0 +1,368 @@
+"""
+Individual delivery-month contracts and continuous-contract construction.
+
+Each commodity's contract chain is cached as one long-format CSV and updated
+incrementally: expired contracts are fetched a final time after delivery and
+never again, and active contracts at most once per day. Active contracts come
+from the exchanges' listings; expired ones are inferred from the delivery
+months the exchange currently lists for the commodity. Continuous series are
+built from the cached chain with a vectorized roll over the whole panel, then
+back-adjusted (additive) or ratio-adjusted to remove roll gaps.
+"""
+
+import json
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from fetch_guard import SourceUnavailable
+
+
+CONTRACT_DIR = Path('data_cache') / 'contracts'
+
+# Years of expired contracts to keep in the chain
+CONTRACT_HISTORY_YEARS = 6
+
+ROLL_RULES = ('volume', 'open_interest', 'calendar')
+ADJUSTMENTS = ('none', 'back', 'ratio')
+
+# Calendar rule: roll this many days before the first day of the delivery month
+CALENDAR_ROLL_DAYS = 15
+
+CHAIN_COLUMNS = ['contract', 'date', 'price', 'volume', 'open_interest']
+
+CONTRACT_CODE_PATTERN = re.compile(r'^([a-z]+)(\d{4})$')
+
+
+class ContractFetchAborted(Exception):
+    """Raised when the upstream source became unavailable part-way through an update."""
+
+
+def parse_listed_contracts(codes) -> dict:
+    """
+    Group exchange contract codes by commodity symbol.
+
+    Args:
+        codes: Iterable of contract codes as listed by an exchange (e.g., 'cu2405', 'A2505')
+
+    Returns:
+        Dictionary mapping symbol to sorted list of contract codes
+    """
+    listed = {}
+    for code in codes:
+        match = CONTRACT_CODE_PATTERN.match(str(code).strip().lower())
+        if match is None:
+            continue
+        listed.setdefault(match.group(1), set()).add(match.group(0))
+    return {symbol: sorted(group, key=delivery_month) for symbol, group in listed.items()}
+
+
+def contract_code(symbol: str, year: int, month: int) -> str:
+    """Build a contract code such as 'cu2401'."""
+    return f"{symbol}{year % 100:02d}{month:02d}"
+
+
+def delivery_month(code: str) -> date:
+    """Return the first day of a contract's delivery month."""
+    return date(2000 + int(code[-4:-2]), int(code[-2:]), 1)
+
+
+def _delivery_month_end(code: str) -> date:
+    start = delivery_month(code)
+    return (start.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+
+
+def _history_start(today: date) -> date:
+    """First delivery month kept in the chain."""
+    return date(today.year - CONTRACT_HISTORY_YEARS, today.month, 1)
+
+
+def candidate_contracts(symbol: str, today: date, listed: list) -> list:
+    """
+    List the contract codes that make up the chain window.
+
+    Args:
+        symbol: Commodity symbol (e.g., 'cu')
+        today: Reference date
+        listed: Contract codes the exchange currently lists for the symbol
+
+    Returns:
+        Listed contracts plus expired contracts in the same delivery months,
+        ordered by delivery month
+    """
+    if not listed:
+        return []
+    months = {delivery_month(code).month for code in listed}
+    first_listed = min(delivery_month(code) for code in listed)
+    start = _history_start(today)
+
+    expired = []
+    for m in range(start.year * 12 + start.month - 1, first_listed.year * 12 + first_listed.month - 1):
+        year, month = m // 12, m % 12 + 1
+        if month in months:
+            expired.append(contract_code(symbol, year, month))
+    return expired + sorted(listed, key=delivery_month)
+
+
+class ContractChain:
+    """
+    Cached chain of individual contracts for one commodity symbol.
+
+    Args:
+        symbol: Commodity symbol (e.g., 'cu')
+        cache_dir: Directory holding chain CSV and metadata files
+    """
+
+    def __init__(self, symbol: str, cache_dir: Path = CONTRACT_DIR):
+        self.symbol = symbol
+        self.cache_dir = Path(cache_dir)
+        self.chain_path = self.cache_dir / f"{symbol}.csv"
+        self.meta_path = self.cache_dir / f"{symbol}.json"
+
+    def load(self) -> pd.DataFrame:
+        """Load the cached chain in long format (one row per contract and date)."""
+        if not self.chain_path.exists():
+            return pd.DataFrame(columns=CHAIN_COLUMNS)
+        return pd.read_csv(self.chain_path, parse_dates=['date'], dtype={'contract': str})
+
+    def _load_meta(self) -> dict:
+        if not self.meta_path.exists():
+            return {'fetched': {}, 'missing': []}
+        with open(self.meta_path) as f:
+            return json.load(f)
+
+    def contracts_to_fetch(self, today: date, listed: list) -> list:
+        """
+        Determine which contracts need fetching to bring the chain up to date.
+
+        A contract is skipped once it has been fetched on or after the end of
+        its delivery month (or today, for active contracts), or if it returned
+        no data after expiry. Contracts that failed are retried.
+        """
+        meta = self._load_meta()
+        missing = set(meta['missing'])
+        to_fetch = []
+        for code in candidate_contracts(self.symbol, today, listed):
+            if code in missing:
+                continue
+            fetched = meta['fetched'].get(code)
+            if fetched is not None and date.fromisoformat(fetched) >= min(today, _delivery_month_end(code)):
+                continue
+            to_fetch.append(code)
+        return to_fetch
+
+    def update(self, fetch, listed: list, today: date = None, max_workers: int = 4) -> int:
+        """
+        Fetch new or still-trading contracts and merge them into the cache.
+
+        Args:
+            fetch: Callable taking a contract code and returning raw daily bars
+                   (columns date, close, volume, hold), or raising on failure
+            listed: Contract codes the exchange currently lists for the symbol
+            today: Reference date, defaults to today
+            max_workers: Parallel upstream requests
+
+        Returns:
+            Number of contracts updated
+
+        Raises:
+            ContractFetchAborted: If the source's circuit breaker opened during
+                the update. Contracts fetched before that point are still saved.
+        """
+        today = today or date.today()
+        to_fetch = self.contracts_to_fetch(today, listed)
+        if not to_fetch:
+            return 0
+
+        current_month = date(today.year, today.month, 1)
+        listed = set(listed)
+        aborted = threading.Event()
+        abort_reason = []
+
+        def fetch_one(code):
+            if aborted.is_set():
+                return code, None
+            try:
+                return code, fetch(code)
+            except SourceUnavailable as e:
+                abort_reason.append(str(e))
+                aborted.set()
+            except Exception:
+                # Errors may be transient (outages, rate limits), so the contract
+                # is retried next run; the fetch guard handles backoff until then
+                pass
+            return code, None
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(fetch_one, to_fetch))
+
+        meta = self._load_meta()
+        fresh = []
+        for code, raw in results:
+            if raw is None:
+                continue
+            bars = _normalize_bars(code, raw).drop_duplicates('date', keep='last')
+            if bars.empty:
+                # Newly listed months may start trading later; expired ones never will
+                if code not in listed and delivery_month(code) < current_month:
+                    meta['missing'].append(code)
+                continue
+            fresh.append(bars)
+            meta['fetched'][code] = today.isoformat()
+
+        if fresh:
+            updated = pd.concat(fresh, ignore_index=True)
+            chain = self.load()
+            chain = chain[~chain['contract'].isin(updated['contract'].unique())]
+            chain = pd.concat([chain, updated], ignore_index=True)
+            # Drop contracts that have aged out of the history window
+            in_window = chain['contract'].map(delivery_month) >= _history_start(today)
+            chain = chain[in_window]
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            chain.sort_values(['contract', 'date']).to_csv(self.chain_path, index=False)
+
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        with open(self.meta_path, 'w') as f:
+            json.dump(meta, f)
+
+        if aborted.is_set():
+            raise ContractFetchAborted(f"Update of {self.symbol} contracts stopped: {abort_reason[0]}")
+        return len(fresh)
+
+
+def _normalize_bars(code: str, raw: pd.DataFrame) -> pd.DataFrame:
+    """Convert raw akshare daily bars into chain rows."""
+    if raw is None or raw.empty or 'date' not in raw.columns or 'close' not in raw.columns:
+        return pd.DataFrame(columns=CHAIN_COLUMNS)
+    bars = pd.DataFrame({
+        'contract': code,
+        'date': pd.to_datetime(raw['date']),
+        'price': pd.to_numeric(raw['close'], errors='coerce'),
+        'volume': pd.to_numeric(raw.get('volume', np.nan), errors='coerce'),
+        'open_interest': pd.to_numeric(raw.get('hold', np.nan), errors='coerce'),
+    })
+    return bars.dropna(subset=['price'])
+
+
+def _next_priced(has_price: np.ndarray, start: np.ndarray) -> np.ndarray:
+    """
+    For each row, find the first column at or after start that has a price.
+
+    Returns:
+        Column index per row, or the number of columns where there is none
+    """
+    n_cols = has_price.shape[1]
+    columns = np.where(has_price, np.arange(n_cols), n_cols)
+    # Running minimum from the right gives the next priced column for every start
+    next_priced = np.minimum.accumulate(columns[:, ::-1], axis=1)[:, ::-1]
+    next_priced = np.concatenate([next_priced, np.full((len(start), 1), n_cols)], axis=1)
+    return next_priced[np.arange(len(start)), np.minimum(start, n_cols)]
+
+
+def build_continuous(chain: pd.DataFrame, roll_rule: str = 'volume', adjustment: str = 'back') -> pd.DataFrame:
+    """
+    Build a continuous series from a contract chain.
+
+    Args:
+        chain: Long-format chain with columns contract, date, price, volume, open_interest
+        roll_rule: 'volume', 'open_interest' or 'calendar'
+        adjustment: 'none', 'back' (additive) or 'ratio'
+
+    Returns:
+        DataFrame with columns: date, price, contract, raw_price
+    """
+    if roll_rule not in ROLL_RULES:
+        raise ValueError(f"Unknown roll rule: {roll_rule}")
+    if adjustment not in ADJUSTMENTS:
+        raise ValueError(f"Unknown adjustment: {adjustment}")
+    if chain.empty:
+        return pd.DataFrame(columns=['date', 'price', 'contract', 'raw_price'])
+    chain = chain.drop_duplicates(['contract', 'date'], keep='last')
+
+    # Wide panels: one row per date, one column per contract in delivery order
+    contracts = sorted(chain['contract'].unique(), key=delivery_month)
+    prices = chain.pivot(index='date', columns='contract', values='price').reindex(columns=contracts).sort_index()
+    dates = prices.index
+    price_panel = prices.to_numpy(dtype=np.float64)
+    # Last known price of each contract, for rolling out of one that stopped trading
+    last_price_panel = prices.ffill().to_numpy(dtype=np.float64)
+
+    has_price = ~np.isnan(price_panel)
+    traded = has_price.any(axis=1)
+
+    if roll_rule == 'calendar':
+        # Only schedule the liquid months: contracts that led volume on some day
+        volume = chain.pivot(index='date', columns='contract', values='volume')
+        volume = volume.reindex(index=dates, columns=contracts).to_numpy(dtype=np.float64)
+        volume = np.where(np.isnan(volume) | ~has_price, -np.inf, volume)
+        led = np.isfinite(volume).any(axis=1)
+        if led.any():
+            liquid = np.zeros(len(contracts), dtype=bool)
+            liquid[volume[led].argmax(axis=1)] = True
+        else:
+            liquid = has_price.any(axis=0)
+        columns = np.flatnonzero(liquid)
+
+        roll_dates = np.array(
+            [np.datetime64(delivery_month(contracts[i])) - np.timedelta64(CALENDAR_ROLL_DAYS, 'D') for i in columns],
+            dtype='datetime64[ns]',
+        )
+        scheduled = np.searchsorted(roll_dates, dates.to_numpy(dtype='datetime64[ns]'), side='right')
+        scheduled = np.minimum(scheduled, len(columns) - 1)
+        # Fall forward to the next liquid contract when the scheduled one has no price
+        position = _next_priced(has_price[:, columns], scheduled)
+        active = np.where(position < len(columns), columns[np.minimum(position, len(columns) - 1)], len(contracts))
+    else:
+        column = 'volume' if roll_rule == 'volume' else 'open_interest'
+        metric = chain.pivot(index='date', columns='contract', values=column)
+        metric = metric.reindex(index=dates, columns=contracts).to_numpy(dtype=np.float64)
+        metric = np.where(np.isnan(metric) | ~has_price, -np.inf, metric)
+        active = np.where(traded, metric.argmax(axis=1), len(contracts))
+
+    # Drop days on which no suitable contract traded, then never roll back to
+    # an earlier contract, falling forward again if the held one has no price
+    keep = active < len(contracts)
+    dates, active, price_panel, last_price_panel, has_price = (
+        dates[keep], active[keep], price_panel[keep], last_price_panel[keep], has_price[keep]
+    )
+    active = _next_priced(has_price, np.maximum.accumulate(active))
+    rows = np.arange(len(dates))
+
+    raw = price_panel[rows, np.minimum(active, len(contracts) - 1)]
+    valid = (active < len(contracts)) & ~np.isnan(raw)
+    dates, active, raw, last_price_panel = dates[valid], active[valid], raw[valid], last_price_panel[valid]
+    rows = np.arange(len(dates))
+    if len(dates) == 0:
+        return pd.DataFrame(columns=['date', 'price', 'contract', 'raw_price'])
+
+    # On each roll date compare the new contract with the last price of the one
+    # being rolled out of, which may already have stopped trading
+    prev_active = np.concatenate(([active[0]], active[:-1]))
+    rolled = active != prev_active
+    old_price = last_price_panel[rows, prev_active]
+    rolled &= ~np.isnan(old_price)
+
+    if adjustment == 'back':
+        gap = np.where(rolled, raw - old_price, 0.0)
+        # Each price is shifted by the sum of all later roll gaps
+        later = np.cumsum(gap[::-1])[::-1] - gap
+        adjusted = raw + later
+    elif adjustment == 'ratio':
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratio = np.where(rolled & (old_price != 0), raw / old_price, 1.0)
+        later = np.cumprod(ratio[::-1])[::-1] / ratio
+        adjusted = raw * later
+    else:
+        adjusted = raw
+
+    return pd.DataFrame({
+        'date': dates,
+        'price': adjusted,
+        'contract': np.asarray(contracts, dtype=object)[active],
+        'raw_price': raw,
+    })
@@ -3,12 +3,22 @@ Data fetching module for Chinese commodity prices from SHFE and DCE exchanges.
 Uses akshare library to fetch historical futures data in RMB.
 """
 
+import argparse
+import logging
 import pandas as pd
 import akshare as ak
 from datetime import datetime, timedelta
 from pathlib import Path
 import streamlit as st
 
+from contracts import ContractChain, build_continuous, parse_listed_contracts
+from fetch_guard import FetchGuard, SourceUnavailable, UpstreamUnavailable
+from series_store import SeriesStore, publish_series
+from spreads import SYNTHETIC_MAP, FormulaError, parse_formula
+
+
+logger = logging.getLogger(__name__)
+
 
 # Commodity mapping to exchange and ticker symbols with categories
 # Complete list from official SHFE and DCE exchange websites (47 commodities total)
@@ -81,11 +91,142 @@ COMMODITY_MAP = {
     'iron_ore': {'exchange': 'DCE', 'symbol': 'i', 'name': 'Iron Ore', 'category': 'Industrial Materials'},
 }
 
+# Exchange symbol to commodity name, for resolving synthetic instrument formulas
+SYMBOL_TO_COMMODITY = {info['symbol']: commodity for commodity, info in COMMODITY_MAP.items()}
+
 # Cache directory
 CACHE_DIR = Path('data_cache')
 CACHE_DIR.mkdir(exist_ok=True)
 
 
+# Earliest date requested when publishing full histories to the series store
+HISTORY_START = '1990-01-01'
+
+# Roll-adjusted continuous series, one store per adjustment method
+CONTINUOUS_STORE_DIR = CACHE_DIR / 'continuous_store'
+CONTINUOUS_ADJUSTMENTS = ('back', 'ratio')
+
+# Exchanges that publish their contract listing per trading day, and how far
+# back to look for the latest one. INE (Shanghai International Energy Exchange)
+# lists sc, lu, nr, bc and ec, which COMMODITY_MAP files under SHFE.
+DAILY_LISTINGS = {'SHFE': 'futures_contract_info_shfe', 'INE': 'futures_contract_info_ine'}
+LISTING_LOOKBACK_DAYS = 14
+
+
+@st.cache_resource
+def get_series_store() -> SeriesStore:
+    """Return the process-wide series store (one memory map per worker process)."""
+    return SeriesStore()
+
+
+@st.cache_resource
+def get_continuous_store(adjustment: str) -> SeriesStore:
+    """Return the process-wide store of continuous series for an adjustment method."""
+    return SeriesStore(CONTINUOUS_STORE_DIR / adjustment)
+
+
+@st.cache_resource
+def get_fetch_guard() -> FetchGuard:
+    """Return the process-wide guard tracking upstream failures."""
+    return FetchGuard()
+
+
+def fetch_sina_daily(symbol: str) -> pd.DataFrame:
+    """
+    Fetch all daily bars of a symbol's main contract from Sina, through the fetch guard.
+    
+    Args:
+        symbol: Commodity symbol (e.g., 'cu')
+    
+    Returns:
+        Raw DataFrame as returned by akshare
+    """
+    # akshare function requires symbol with '0' suffix for main contract
+    return get_fetch_guard().call('sina', symbol, ak.futures_zh_daily_sina, symbol=f"{symbol}0")
+
+
+def fetch_contract_bars(contract: str) -> pd.DataFrame:
+    """
+    Fetch all daily bars of an individual delivery-month contract, through the fetch guard.
+    
+    Args:
+        contract: Contract code (e.g., 'cu2401')
+    
+    Returns:
+        Raw DataFrame as returned by akshare
+    """
+    return get_fetch_guard().call('sina', contract, ak.futures_zh_daily_sina, symbol=contract)
+
+
+def fetch_listed_contracts(exchange: str) -> dict:
+    """
+    Fetch the contracts an exchange currently lists, through the fetch guard.
+    
+    Args:
+        exchange: 'SHFE', 'INE' or 'DCE'
+    
+    Returns:
+        Dictionary mapping commodity symbol to listed contract codes
+    """
+    guard = get_fetch_guard()
+    if exchange in DAILY_LISTINGS:
+        listing_func = getattr(ak, DAILY_LISTINGS[exchange])
+        errors = []
+        
+        def listing_for(day):
+            # Non-trading days have no listing; treat their errors as an empty
+            # answer so a long holiday doesn't count against the source
+            try:
+                return listing_func(date=day)
+            except Exception as e:
+                errors.append(f"{day}: {e}")
+                return pd.DataFrame()
+        
+        # SHFE and INE publish the listing per trading day; step back over weekends and holidays
+        df = pd.DataFrame()
+        for days_back in range(LISTING_LOOKBACK_DAYS):
+            day = datetime.now() - timedelta(days=days_back)
+            if day.weekday() >= 5:
+                continue
+            day = day.strftime('%Y%m%d')
+            try:
+                df = guard.call('exchange', f"{exchange.lower()}_contracts_{day}", listing_for, day)
+            except SourceUnavailable:
+                raise
+            except (UpstreamUnavailable, TimeoutError):
+                continue
+            if df is not None and not df.empty:
+                break
+        if (df is None or df.empty) and errors:
+            raise RuntimeError(f"No contract listing available from {exchange} (last error {errors[-1]})")
+    elif exchange == 'DCE':
+        df = guard.call('exchange', 'dce_contracts', ak.futures_contract_info_dce)
+    else:
+        raise ValueError(f"Unknown exchange: {exchange}")
+    
+    if df is None or df.empty:
+        raise RuntimeError(f"No contract listing available from {exchange}")
+    code_columns = [c for c in df.columns if '合约' in str(c)]
+    if not code_columns:
+        raise RuntimeError(f"Contract code column not found in {exchange} listing")
+    return parse_listed_contracts(df[code_columns[0]])
+
+
+def get_fetch_status(commodity: str):
+    """
+    Get the reason a commodity is currently not being fetched, if any.
+    
+    Args:
+        commodity: Commodity name (e.g., 'wire_rod')
+    
+    Returns:
+        Status message, or None if the commodity is available
+    """
+    if commodity not in COMMODITY_MAP:
+        return None
+    return get_fetch_guard().status('sina', COMMODITY_MAP[commodity]['symbol'])
+
+
 def get_cache_path(commodity: str, start_date: str, end_date: str) -> Path:
     """Generate cache file path for a commodity and date range."""
     # Remove dashes from date strings for filename
@@ -108,12 +249,8 @@ def fetch_shfe_futures(symbol: str, start_date: str, end_date: str) -> pd.DataFr
         DataFrame with historical price data
     """
     try:
-        # akshare function requires symbol with '0' suffix for main contract
-        # It returns all historical data, we'll filter by date range
-        symbol_with_suffix = f"{symbol}0"
-        
-        # Fetch all historical data
-        df = ak.futures_zh_daily_sina(symbol=symbol_with_suffix)
+        # Fetch all historical data, we'll filter by date range
+        df = fetch_sina_daily(symbol)
         
         if df is not None and not df.empty:
             # Convert date column to datetime if not already
@@ -144,6 +281,9 @@ def fetch_shfe_futures(symbol: str, start_date: str, end_date: str) -> pd.DataFr
                 df = df.dropna()
                 return df
             
+    except UpstreamUnavailable:
+        # Recently failed; the caller reports the status instead of warning again
+        pass
     except Exception as e:
         st.warning(f"Error fetching SHFE data for {symbol}: {str(e)}")
     
@@ -164,11 +304,7 @@ def fetch_dce_futures(symbol: str, start_date: str, end_date: str) -> pd.DataFra
     """
     try:
         # DCE futures use the same akshare function as SHFE
-        # Symbol needs '0' suffix for main contract
-        symbol_with_suffix = f"{symbol}0"
-        
-        # Fetch all historical data
-        df = ak.futures_zh_daily_sina(symbol=symbol_with_suffix)
+        df = fetch_sina_daily(symbol)
         
         if df is not None and not df.empty:
             # Convert date column to datetime if not already
@@ -199,13 +335,17 @@ def fetch_dce_futures(symbol: str, start_date: str, end_date: str) -> pd.DataFra
                 df = df.dropna()
                 return df
                 
+    except UpstreamUnavailable:
+        # Recently failed; the caller reports the status instead of warning again
+        pass
     except Exception as e:
         st.warning(f"Error fetching DCE data for {symbol}: {str(e)}")
     
     return pd.DataFrame()
 
 
-def fetch_commodity_data(commodity: str, start_date: datetime, end_date: datetime, use_cache: bool = True) -> pd.DataFrame:
+def fetch_commodity_data(commodity: str, start_date: datetime, end_date: datetime, use_cache: bool = True,
+                         adjustment: str = 'none') -> pd.DataFrame:
     """
     Fetch historical commodity price data.
     
@@ -214,14 +354,29 @@ def fetch_commodity_data(commodity: str, start_date: datetime, end_date: datetim
         start_date: Start date as datetime object
         end_date: End date as datetime object
         use_cache: Whether to use cached data if available
+        adjustment: 'none' for the main-contract series, or 'back'/'ratio' for
+                    the roll-adjusted continuous series when one has been built.
+                    Ignored for synthetic instruments, which always combine
+                    unadjusted legs
     
     Returns:
-        DataFrame with columns: date, price (in RMB)
+        DataFrame with columns: date, price (in RMB). Frames served from the
+        series stores are read-only views of the memory-mapped files; call
+        .copy() before modifying them in place
     """
+    if commodity in SYNTHETIC_MAP:
+        return fetch_formula_data(SYNTHETIC_MAP[commodity]['formula'], start_date, end_date)
+    
     if commodity not in COMMODITY_MAP:
         st.error(f"Unknown commodity: {commodity}")
         return pd.DataFrame()
     
+    # Roll-adjusted series come only from the continuous store; fall back to the main contract
+    if adjustment in CONTINUOUS_ADJUSTMENTS:
+        df = get_continuous_store(adjustment).get_frame(commodity, start_date, end_date)
+        if not df.empty:
+            return df
+    
     commodity_info = COMMODITY_MAP[commodity]
     symbol = commodity_info['symbol']
     exchange = commodity_info['exchange']
@@ -230,8 +385,12 @@ def fetch_commodity_data(commodity: str, start_date: datetime, end_date: datetim
     start_str = start_date.strftime('%Y-%m-%d')
     end_str = end_date.strftime('%Y-%m-%d')
     
-    # Check cache
+    # Check the shared series store first, then the per-range CSV cache
     if use_cache:
+        df = get_series_store().get_frame(commodity, start_date, end_date)
+        if not df.empty:
+            return df
+
         cache_path = get_cache_path(commodity, start_str, end_str)
         if cache_path.exists():
             try:
@@ -254,7 +413,8 @@ def fetch_commodity_data(commodity: str, start_date: datetime, end_date: datetim
     
     # Validate and process data
     if df.empty:
-        st.warning(f"No data available for {commodity_info['name']}")
+        if get_fetch_status(commodity) is None:
+            st.warning(f"No data available for {commodity_info['name']}")
         return pd.DataFrame()
     
     # Ensure we have the right columns
@@ -273,25 +433,285 @@ def fetch_commodity_data(commodity: str, start_date: datetime, end_date: datetim
     return df
 
 
+@st.cache_data(ttl=3600, show_spinner=False)
+def fetch_formula_data(formula: str, start_date: datetime, end_date: datetime) -> pd.DataFrame:
+    """
+    Evaluate a synthetic instrument formula over cached commodity series.
+    
+    Results are cached per formula and date window. Legs are always unadjusted
+    main-contract prices: each leg's roll adjustment shifts its history by its
+    own roll gaps, so combining adjusted legs would not give the real spread.
+    
+    Args:
+        formula: Arithmetic expression over exchange symbols (e.g., 'cu / al')
+        start_date: Start date as datetime object
+        end_date: End date as datetime object
+    
+    Returns:
+        DataFrame with columns: date, price
+    """
+    parsed = _parse_synthetic_formula(formula)
+    if parsed is None:
+        return pd.DataFrame()
+    
+    series = {}
+    for symbol in parsed.symbols:
+        series[symbol] = fetch_commodity_data(SYMBOL_TO_COMMODITY[symbol], start_date, end_date, use_cache=True)
+    return parsed.evaluate(series)
+
+
+def _parse_synthetic_formula(formula: str):
+    """
+    Parse a formula over COMMODITY_MAP symbols.
+    
+    Returns:
+        Parsed Formula, or None if the formula is invalid (the error is shown)
+    """
+    try:
+        return parse_formula(formula, frozenset(SYMBOL_TO_COMMODITY))
+    except FormulaError as e:
+        st.error(str(e))
+        return None
+
+
+def get_lookback_prices(commodity: str, current_date: datetime, fallback_df: pd.DataFrame = None,
+                        adjustment: str = 'none', history: pd.DataFrame = None) -> dict:
+    """
+    Get prices 1 to 5 years before a reference date.
+
+    Args:
+        commodity: Commodity name (e.g., 'copper')
+        current_date: Reference date to look back from
+        fallback_df: Data to use if the extended history cannot be fetched
+        adjustment: Series adjustment passed to fetch_commodity_data
+        history: Full history to look prices up in instead of fetching a window
+
+    Returns:
+        Dictionary mapping years back (1-5) to price, or None if unavailable
+    """
+    # Fetch extended historical data for comparison (go back 5+ years from current date)
+    extended_start_date = current_date - timedelta(days=365 * 6)  # 6 years to ensure we have 5 years
+    if history is not None:
+        extended_df = history[(history['date'] >= extended_start_date) & (history['date'] <= current_date)]
+    else:
+        extended_df = fetch_commodity_data(commodity, extended_start_date, current_date, use_cache=True,
+                                           adjustment=adjustment)
+    
+    # Use extended data if available, otherwise fall back to the caller's data
+    comparison_df = extended_df
+    if comparison_df.empty and fallback_df is not None:
+        comparison_df = fallback_df
+    
+    lookback = {}
+    for years_back in range(1, 6):  # 1 to 5 years ago
+        lookback[years_back] = None
+        if comparison_df.empty:
+            continue
+        target_date = current_date - timedelta(days=365 * years_back)
+        # Find closest date to target date (within ±30 days for flexibility)
+        historical_data = comparison_df[
+            (comparison_df['date'] >= target_date - timedelta(days=30)) &
+            (comparison_df['date'] <= target_date + timedelta(days=30))
+        ]
+        
+        if not historical_data.empty:
+            # Get the closest date to target
+            date_diff = abs((historical_data['date'] - target_date).dt.days)
+            lookback[years_back] = historical_data.loc[date_diff.idxmin(), 'price']
+        else:
+            # Fallback: try to find any data before target date
+            fallback_data = comparison_df[comparison_df['date'] <= target_date]
+            if not fallback_data.empty:
+                lookback[years_back] = fallback_data['price'].iloc[-1]
+    
+    return lookback
+
+
+def get_history_cache_path(commodity: str) -> Path:
+    """Generate cache file path for a commodity's full history."""
+    return CACHE_DIR / f"{commodity}_full.csv"
+
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def _load_history_cache(commodity: str, day: str) -> pd.DataFrame:
+    """
+    Load a commodity's full history, refreshing the cache file once per day.
+    
+    Args:
+        commodity: Commodity name (e.g., 'copper')
+        day: Current date as 'YYYY-MM-DD', so the in-memory cache also turns over daily
+    
+    Returns:
+        DataFrame with columns: date, price
+    """
+    cache_path = get_history_cache_path(commodity)
+    if cache_path.exists() and datetime.fromtimestamp(cache_path.stat().st_mtime).strftime('%Y-%m-%d') == day:
+        return _read_history_cache(cache_path)
+    
+    info = COMMODITY_MAP[commodity]
+    if info['exchange'] == 'SHFE':
+        df = fetch_shfe_futures(info['symbol'], HISTORY_START, day)
+    else:
+        df = fetch_dce_futures(info['symbol'], HISTORY_START, day)
+    
+    if df.empty:
+        # Serve the previous day's history rather than nothing
+        if cache_path.exists():
+            return _read_history_cache(cache_path)
+        return pd.DataFrame()
+    df.to_csv(cache_path, index=False)
+    return _read_history_cache(cache_path)
+
+
+def _read_history_cache(cache_path: Path) -> pd.DataFrame:
+    """Read a full-history cache file, recording when it was written."""
+    df = pd.read_csv(cache_path, parse_dates=['date'])
+    df.attrs['published'] = datetime.fromtimestamp(cache_path.stat().st_mtime)
+    return df
+
+
+def fetch_commodity_history(commodity: str, adjustment: str = 'none') -> pd.DataFrame:
+    """
+    Get a commodity's full history from a single source per commodity.
+    
+    Windows can be cut from the result without another upstream request. The
+    series stores are used when they hold the commodity; otherwise one
+    full-history cache file per commodity is refreshed daily. The time the
+    data was published (store version or cache file write) is kept in
+    attrs['published']. Store-backed frames are read-only views of the
+    memory-mapped files.
+    
+    Args:
+        commodity: Commodity name (e.g., 'copper', 'steel_mill_margin')
+        adjustment: 'none' for the main-contract series, or 'back'/'ratio'.
+                    Ignored for synthetic instruments, which always combine
+                    unadjusted legs
+    
+    Returns:
+        DataFrame with columns: date, price
+    """
+    if commodity in SYNTHETIC_MAP:
+        parsed = _parse_synthetic_formula(SYNTHETIC_MAP[commodity]['formula'])
+        if parsed is None:
+            return pd.DataFrame()
+        series = {symbol: fetch_commodity_history(SYMBOL_TO_COMMODITY[symbol]) for symbol in parsed.symbols}
+        result = parsed.evaluate(series)
+        published = [df.attrs.get('published') for df in series.values()]
+        if not result.empty and None not in published:
+            result.attrs['published'] = max(published)
+        return result
+    
+    stores = [get_series_store()]
+    if adjustment in CONTINUOUS_ADJUSTMENTS:
+        stores.insert(0, get_continuous_store(adjustment))
+    for store in stores:
+        arrays = store.get_arrays(commodity)
+        if arrays is not None:
+            dates, prices = arrays
+            df = pd.DataFrame({'date': dates, 'price': prices}, copy=False)
+            df.attrs['published'] = store.published
+            return df
+    
+    return _load_history_cache(commodity, datetime.now().strftime('%Y-%m-%d'))
+
+
+def refresh_series_store() -> str:
+    """
+    Fetch the full history of every commodity and publish it to the series store.
+
+    Intended to run from a scheduled refresh job, once per host.
+
+    Returns:
+        Name of the published store version
+    """
+    end_str = datetime.now().strftime('%Y-%m-%d')
+    frames = {}
+    for commodity, info in COMMODITY_MAP.items():
+        if info['exchange'] == 'SHFE':
+            df = fetch_shfe_futures(info['symbol'], HISTORY_START, end_str)
+        else:
+            df = fetch_dce_futures(info['symbol'], HISTORY_START, end_str)
+        if not df.empty:
+            frames[commodity] = df
+    return publish_series(frames)
+
+
+def refresh_continuous_store(roll_rule: str = 'volume', update_contracts: bool = True) -> dict:
+    """
+    Update every commodity's contract chain and publish continuous series.
+    
+    Only contracts that are new or still trading are fetched; the continuous
+    series are then rebuilt from the cached chains. If the upstream source
+    becomes unavailable part-way, nothing is published.
+    
+    Args:
+        roll_rule: 'volume', 'open_interest' or 'calendar'
+        update_contracts: Whether to fetch new contract data before rebuilding
+    
+    Returns:
+        Dictionary mapping adjustment method to published store version
+    
+    Raises:
+        ContractFetchAborted: If the source's circuit breaker opened during the update
+    """
+    if update_contracts:
+        listings = {exchange: fetch_listed_contracts(exchange) for exchange in ('SHFE', 'DCE')}
+        # INE contracts are filed under SHFE in COMMODITY_MAP
+        listings['SHFE'] = {**listings['SHFE'], **fetch_listed_contracts('INE')}
+    
+    chains = {}
+    for commodity, info in COMMODITY_MAP.items():
+        chain = ContractChain(info['symbol'])
+        if update_contracts:
+            listed = listings[info['exchange']].get(info['symbol'], [])
+            if not listed:
+                logger.warning("No listed contracts for %s (%s); keeping its cached chain",
+                               commodity, info['symbol'])
+            chain.update(fetch_contract_bars, listed)
+        chains[commodity] = chain.load()
+    
+    versions = {}
+    for adjustment in CONTINUOUS_ADJUSTMENTS:
+        frames = {commodity: build_continuous(chain, roll_rule, adjustment) for commodity, chain in chains.items()}
+        versions[adjustment] = publish_series(frames, CONTINUOUS_STORE_DIR / adjustment)
+    return versions
+
+
+def get_commodity_info(commodity: str) -> dict:
+    """Get map entry for a real or synthetic commodity."""
+    return COMMODITY_MAP.get(commodity) or SYNTHETIC_MAP.get(commodity, {})
+
+
 def get_available_commodities():
-    """Return list of available commodity names."""
-    return list(COMMODITY_MAP.keys())
+    """Return list of available commodity names, including synthetic instruments."""
+    return list(COMMODITY_MAP.keys()) + list(SYNTHETIC_MAP.keys())
 
 
 def get_commodity_display_name(commodity: str) -> str:
     """Get display name for a commodity."""
-    return COMMODITY_MAP.get(commodity, {}).get('name', commodity)
+    return get_commodity_info(commodity).get('name', commodity)
 
 
 def get_commodity_category(commodity: str) -> str:
     """Get category for a commodity."""
-    return COMMODITY_MAP.get(commodity, {}).get('category', 'Other')
+    return get_commodity_info(commodity).get('category', 'Other')
+
+
+def get_commodity_unit(commodity: str) -> str:
+    """Get price unit for a commodity: 'RMB', or 'ratio' for dimensionless ratios."""
+    return get_commodity_info(commodity).get('unit', 'RMB')
+
+
+def is_synthetic(commodity: str) -> bool:
+    """Return True if the commodity is a synthetic spread or ratio."""
+    return commodity in SYNTHETIC_MAP
 
 
 def get_categories():
     """Return list of all available categories."""
     categories = set()
-    for commodity_info in COMMODITY_MAP.values():
+    for commodity in get_available_commodities():
+        commodity_info = get_commodity_info(commodity)
         if 'category' in commodity_info:
             categories.add(commodity_info['category'])
     return sorted(list(categories))
@@ -300,10 +720,29 @@ def get_categories():
 def get_commodities_by_category():
     """Return dictionary of commodities grouped by category."""
     categorized = {}
-    for commodity, info in COMMODITY_MAP.items():
+    for commodity in get_available_commodities():
+        info = get_commodity_info(commodity)
         category = info.get('category', 'Other')
         if category not in categorized:
             categorized[category] = []
         categorized[category].append(commodity)
     return categorized
 
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Refresh the shared series stores")
+    parser.add_argument('--continuous', action='store_true',
+                        help="also update contract chains and rebuild continuous series")
+    parser.add_argument('--roll', choices=['volume', 'open_interest', 'calendar'], default='volume',
+                        help="roll rule for continuous series")
+    parser.add_argument('--rebuild-only', action='store_true',
+                        help="rebuild continuous series from cached contracts without fetching")
+    args = parser.parse_args()
+    
+    if not args.rebuild_only:
+        version = refresh_series_store()
+        print(f"Published series store version {version}")
+    if args.continuous or args.rebuild_only:
+        versions = refresh_continuous_store(args.roll, update_contracts=not args.rebuild_only)
+        for adjustment, version in versions.items():
+            print(f"Published {adjustment}-adjusted continuous store version {version}")
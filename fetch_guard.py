@@ -0,0 +1,235 @@
+"""
+Failure tracking for upstream data sources.
+
+Wraps upstream calls with a per-call timeout, remembers symbols that recently
+failed or returned no data (negative caching with exponential backoff), and
+opens a circuit breaker per source after repeated errors so dead or illiquid
+symbols don't cost a full upstream round trip on every rerun.
+"""
+
+import threading
+import time
+
+
+# Per-call timeout budget for a single upstream request (seconds)
+CALL_TIMEOUT = 20
+
+# Backoff for a failing symbol: BACKOFF_BASE * 2 ** (failures - 1), capped
+BACKOFF_BASE = 60
+BACKOFF_MAX = 6 * 60 * 60
+
+# Consecutive errors before a source's breaker opens, and how long it stays open
+BREAKER_THRESHOLD = 5
+BREAKER_COOLDOWN = 120
+
+
+class UpstreamUnavailable(Exception):
+    """Raised when a call is skipped because the symbol or source is backing off."""
+
+    def __init__(self, message: str, retry_in: float):
+        super().__init__(message)
+        self.retry_in = retry_in
+
+
+class SourceUnavailable(UpstreamUnavailable):
+    """Raised when a call is skipped because the source's circuit breaker is open."""
+
+
+class _SymbolState:
+    """Consecutive failures and next retry time for one symbol."""
+
+    def __init__(self):
+        self.failures = 0
+        self.retry_at = 0.0
+        self.reason = ''
+
+
+class _Call:
+    """An upstream call running on its own thread, shared by concurrent callers."""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class _Breaker:
+    """Circuit breaker state for one upstream source."""
+
+    def __init__(self):
+        self.errors = 0
+        self.open_until = 0.0
+        self.probing = False
+
+
+class FetchGuard:
+    """
+    Thread-safe guard shared by all sessions of a worker process.
+
+    Args:
+        timeout: Per-call timeout in seconds
+    """
+
+    def __init__(self, timeout: float = CALL_TIMEOUT):
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._symbols = {}
+        self._breakers = {}
+        self._in_flight = {}
+
+    def call(self, source: str, key: str, func, *args, **kwargs):
+        """
+        Call an upstream function for a key, honouring backoff and the breaker.
+
+        Args:
+            source: Upstream source name (e.g., 'sina')
+            key: Symbol or contract being requested (e.g., 'cu', 'cu2401')
+            func: Upstream function to call
+            *args, **kwargs: Arguments for func
+
+        Returns:
+            Result of func
+
+        Raises:
+            UpstreamUnavailable: If the call was skipped
+            TimeoutError: If the call exceeded the timeout budget
+        """
+        with self._lock:
+            now = time.monotonic()
+            half_open = self._check(source, key, now)
+            pending = self._in_flight.get(key)
+            if pending is None:
+                pending = self._in_flight[key] = _Call()
+                leader = True
+                if half_open:
+                    # Only the caller that actually sends a request probes the source
+                    self._breakers[source].probing = True
+            elif now - pending.started >= self.timeout:
+                # An earlier request for this key is still hung; don't pile on
+                state = self._backoff(key, 'previous request still pending')
+                retry_in = state.retry_at - now
+                raise UpstreamUnavailable(
+                    f"temporarily unavailable ({state.reason}); retrying in {_format_delay(retry_in)}",
+                    retry_in,
+                )
+            else:
+                leader = False
+
+        if leader:
+            # Each call gets its own daemon thread, so the timeout starts now and
+            # a hung request never holds up calls for other keys
+            thread = threading.Thread(
+                target=self._run, args=(key, pending, func, args, kwargs),
+                name=f"upstream-{key}", daemon=True,
+            )
+            thread.start()
+
+        # Concurrent callers for the same key share the leader's request
+        if not pending.done.wait(self.timeout):
+            if leader:
+                self._record_error(source, key, f"timed out after {self.timeout:.0f}s")
+            raise TimeoutError(f"{source} request for {key} timed out after {self.timeout:.0f}s")
+        if pending.error is not None:
+            if leader:
+                self._record_error(source, key, str(pending.error))
+            raise pending.error
+        result = pending.result
+        if not leader:
+            return result
+
+        # An empty answer means the source is healthy but the symbol is not
+        if result is None or getattr(result, 'empty', False):
+            self._record_empty(source, key)
+        else:
+            self._record_success(source, key)
+        return result
+
+    def _run(self, key: str, pending: _Call, func, args: tuple, kwargs: dict):
+        """Run an upstream call on its own thread and publish the outcome."""
+        try:
+            pending.result = func(*args, **kwargs)
+        except Exception as e:
+            pending.error = e
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+            pending.done.set()
+
+    def status(self, source: str, key: str):
+        """
+        Describe why a symbol or contract is currently being skipped.
+
+        Returns:
+            Human-readable status, or None if it can be fetched
+        """
+        try:
+            with self._lock:
+                self._check(source, key, time.monotonic())
+        except UpstreamUnavailable as e:
+            return str(e)
+        return None
+
+    def _check(self, source: str, key: str, now: float) -> bool:
+        """
+        Raise if the key is backing off or the source's breaker is open.
+
+        Must be called with the lock held.
+
+        Returns:
+            True if the breaker is half-open and the next request would probe it
+        """
+        state = self._symbols.get(key)
+        if state is not None and state.retry_at > now:
+            retry_in = state.retry_at - now
+            raise UpstreamUnavailable(
+                f"temporarily unavailable ({state.reason}); retrying in {_format_delay(retry_in)}",
+                retry_in,
+            )
+
+        breaker = self._breakers.get(source)
+        if breaker is None or breaker.errors < BREAKER_THRESHOLD:
+            return False
+        if breaker.open_until > now or breaker.probing:
+            retry_in = max(breaker.open_until - now, 0)
+            raise SourceUnavailable(
+                f"data source '{source}' temporarily unavailable; retrying in {_format_delay(retry_in)}",
+                retry_in,
+            )
+        return True
+
+    def _record_success(self, source: str, key: str):
+        with self._lock:
+            self._symbols.pop(key, None)
+            self._breakers.pop(source, None)
+
+    def _record_empty(self, source: str, key: str):
+        with self._lock:
+            self._breakers.pop(source, None)
+            self._backoff(key, 'no data returned')
+
+    def _record_error(self, source: str, key: str, reason: str):
+        with self._lock:
+            breaker = self._breakers.setdefault(source, _Breaker())
+            breaker.errors += 1
+            breaker.probing = False
+            if breaker.errors >= BREAKER_THRESHOLD:
+                breaker.open_until = time.monotonic() + BREAKER_COOLDOWN
+            self._backoff(key, reason)
+
+    def _backoff(self, key: str, reason: str):
+        state = self._symbols.setdefault(key, _SymbolState())
+        state.failures += 1
+        delay = min(BACKOFF_BASE * 2 ** (state.failures - 1), BACKOFF_MAX)
+        state.retry_at = time.monotonic() + delay
+        state.reason = reason
+        return state
+
+
+def _format_delay(seconds: float) -> str:
+    """Format a delay in seconds as a short human-readable string."""
+    if seconds < 60:
+        return f"{seconds:.0f}s"
+    if seconds < 3600:
+        return f"{seconds / 60:.0f} min"
+    return f"{seconds / 3600:.1f} h"
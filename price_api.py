@@ -0,0 +1,305 @@
+"""
+Headless HTTP API serving the normalized SHFE/DCE price series.
+
+Runs on top of the data layer's full-history caches, so other tools can poll
+the same data as the dashboard without calling akshare themselves. Windows
+are cut from one cached history per commodity, so arbitrary start/end dates
+never trigger another upstream download.
+
+Endpoints (all GET):
+    /categories                          Commodities grouped by category
+    /series/<commodity>?start=&end=      Single series, optionally windowed
+    /series?commodities=a,b&start=&end=  Batch of series
+    /lookback?commodities=a,b            Current price and prices 1-5 years ago
+
+Series and lookback endpoints accept adjustment=none (main contract, default),
+back or ratio for roll-adjusted continuous series.
+Series endpoints accept format=json (columnar, default), csv or npz.
+Responses carry ETag/Last-Modified headers, honour If-None-Match and
+If-Modified-Since, and are gzip-compressed when the client accepts it.
+Last-Modified is the time the underlying data was published.
+"""
+
+import argparse
+import gzip
+import hashlib
+import io
+import json
+from datetime import datetime, timedelta
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+
+from contracts import ADJUSTMENTS
+from data_fetcher import (
+    fetch_commodity_history,
+    get_commodities_by_category,
+    get_available_commodities,
+    get_lookback_prices
+)
+
+
+# Default window when no start date is given (matches the dashboard default)
+DEFAULT_RANGE_DAYS = 5 * 365
+
+# Bodies smaller than this are not worth compressing
+GZIP_MIN_BYTES = 1024
+
+CONTENT_TYPES = {
+    'json': 'application/json',
+    'csv': 'text/csv; charset=utf-8',
+    'npz': 'application/x-npz',
+}
+
+
+class ApiError(Exception):
+    """Error returned to the client with an HTTP status code."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def parse_date_range(params: dict):
+    """
+    Parse start/end query parameters into a datetime window.
+
+    Args:
+        params: Parsed query string
+
+    Returns:
+        Tuple of (start_date, end_date) datetime objects
+    """
+    try:
+        if 'end' in params:
+            end_date = datetime.strptime(params['end'][0], '%Y-%m-%d')
+        else:
+            end_date = datetime.now()
+        if 'start' in params:
+            start_date = datetime.strptime(params['start'][0], '%Y-%m-%d')
+        else:
+            start_date = end_date - timedelta(days=DEFAULT_RANGE_DAYS)
+    except ValueError:
+        raise ApiError(400, "Dates must use format YYYY-MM-DD")
+
+    if start_date > end_date:
+        raise ApiError(400, "start must not be after end")
+    start_date = datetime.combine(start_date.date(), datetime.min.time())
+    end_date = datetime.combine(end_date.date(), datetime.max.time())
+    return start_date, end_date
+
+
+def parse_commodities(params: dict) -> list:
+    """Parse and validate the comma-separated commodities query parameter."""
+    raw = ','.join(params.get('commodities', []))
+    commodities = [c.strip() for c in raw.split(',') if c.strip()]
+    if not commodities:
+        raise ApiError(400, "commodities parameter is required")
+    available = set(get_available_commodities())
+    for commodity in commodities:
+        if commodity not in available:
+            raise ApiError(404, f"Unknown commodity: {commodity}")
+    return commodities
+
+
+def parse_adjustment(params: dict) -> str:
+    """Parse and validate the adjustment query parameter."""
+    adjustment = params.get('adjustment', ['none'])[0]
+    if adjustment not in ADJUSTMENTS:
+        raise ApiError(400, f"Unsupported adjustment: {adjustment}")
+    return adjustment
+
+
+def encode_series(frames: dict, fmt: str) -> bytes:
+    """
+    Encode one or more series in the requested format.
+
+    Args:
+        frames: Mapping of commodity name to DataFrame with date, price columns
+        fmt: One of 'json', 'csv' or 'npz'
+
+    Returns:
+        Encoded response body
+    """
+    if fmt == 'json':
+        payload = {}
+        for commodity, df in frames.items():
+            payload[commodity] = {
+                'date': df['date'].dt.strftime('%Y-%m-%d').tolist(),
+                'price': df['price'].tolist(),
+            }
+        return json.dumps(payload, separators=(',', ':')).encode('utf-8')
+
+    if fmt == 'csv':
+        parts = []
+        for commodity, df in frames.items():
+            out = df[['date', 'price']].copy()
+            out.insert(0, 'commodity', commodity)
+            parts.append(out)
+        combined = pd.concat(parts) if parts else pd.DataFrame(columns=['commodity', 'date', 'price'])
+        return combined.to_csv(index=False, date_format='%Y-%m-%d').encode('utf-8')
+
+    if fmt == 'npz':
+        # Columnar binary: <commodity>.date as int64 days since epoch, <commodity>.price as float64
+        arrays = {}
+        for commodity, df in frames.items():
+            arrays[f"{commodity}.date"] = df['date'].to_numpy(dtype='datetime64[D]').astype(np.int64)
+            arrays[f"{commodity}.price"] = df['price'].to_numpy(dtype=np.float64)
+        buffer = io.BytesIO()
+        np.savez(buffer, **arrays)
+        return buffer.getvalue()
+
+    raise ApiError(400, f"Unsupported format: {fmt}")
+
+
+def slice_window(history: pd.DataFrame, start_date: datetime, end_date: datetime) -> pd.DataFrame:
+    """Cut a date window out of a full history."""
+    if history.empty:
+        return pd.DataFrame({'date': pd.to_datetime([]), 'price': []})
+    window = history[(history['date'] >= start_date) & (history['date'] <= end_date)]
+    return window.reset_index(drop=True)
+
+
+def last_modified_of(histories: dict):
+    """
+    Return when the data behind a response was last published, or None.
+
+    Uses the publish time of each history's source (store version or cache
+    file), not its last data date: adjusted series and same-day bars change
+    without the last date moving.
+    """
+    published = [df.attrs.get('published') for df in histories.values() if not df.empty]
+    if not published or None in published:
+        return None
+    return max(published)
+
+
+class PriceApiHandler(BaseHTTPRequestHandler):
+    """Request handler for the price API."""
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = parse_qs(url.query)
+        parts = [p for p in url.path.split('/') if p]
+
+        try:
+            if parts == ['categories']:
+                body = json.dumps(get_commodities_by_category(), separators=(',', ':')).encode('utf-8')
+                self.send_body(body, 'json', None)
+            elif parts and parts[0] == 'series' and len(parts) <= 2:
+                if len(parts) == 2:
+                    params['commodities'] = [parts[1]]
+                self.handle_series(params)
+            elif parts == ['lookback']:
+                self.handle_lookback(params)
+            else:
+                raise ApiError(404, f"Not found: {url.path}")
+        except ApiError as e:
+            body = json.dumps({'error': e.message}).encode('utf-8')
+            self.send_body(body, 'json', None, status=e.status, cacheable=False)
+
+    def handle_series(self, params: dict):
+        commodities = parse_commodities(params)
+        start_date, end_date = parse_date_range(params)
+        adjustment = parse_adjustment(params)
+        fmt = params.get('format', ['json'])[0]
+        if fmt not in CONTENT_TYPES:
+            raise ApiError(400, f"Unsupported format: {fmt}")
+
+        histories = {commodity: fetch_commodity_history(commodity, adjustment) for commodity in commodities}
+        frames = {commodity: slice_window(history, start_date, end_date) for commodity, history in histories.items()}
+
+        self.send_body(encode_series(frames, fmt), fmt, last_modified_of(histories))
+
+    def handle_lookback(self, params: dict):
+        commodities = parse_commodities(params)
+        adjustment = parse_adjustment(params)
+        snapshot = {}
+        histories = {}
+        for commodity in commodities:
+            history = fetch_commodity_history(commodity, adjustment)
+            if history.empty:
+                snapshot[commodity] = None
+                continue
+            histories[commodity] = history
+            current_date = history['date'].iloc[-1]
+            lookback = get_lookback_prices(commodity, current_date, adjustment=adjustment, history=history)
+            snapshot[commodity] = {
+                'date': current_date.strftime('%Y-%m-%d'),
+                'current': float(history['price'].iloc[-1]),
+                'years_ago': {str(k): (None if v is None else float(v)) for k, v in lookback.items()},
+            }
+
+        body = json.dumps(snapshot, separators=(',', ':')).encode('utf-8')
+        self.send_body(body, 'json', last_modified_of(histories))
+
+    def send_body(self, body: bytes, fmt: str, last_modified, status: int = 200, cacheable: bool = True):
+        """Send a response, applying conditional request and gzip handling."""
+        headers = {'Content-Type': CONTENT_TYPES[fmt], 'Vary': 'Accept-Encoding'}
+        use_gzip = len(body) >= GZIP_MIN_BYTES and 'gzip' in self.headers.get('Accept-Encoding', '')
+
+        if cacheable:
+            # The compressed representation gets its own tag
+            digest = hashlib.sha1(body).hexdigest()
+            etag = f'"{digest}-gzip"' if use_gzip else f'"{digest}"'
+            headers['ETag'] = etag
+            if last_modified is not None:
+                headers['Last-Modified'] = formatdate(last_modified.timestamp(), usegmt=True)
+            if self.not_modified(etag, last_modified):
+                self.send_response(304)
+                for name, value in headers.items():
+                    if name != 'Content-Type':
+                        self.send_header(name, value)
+                self.end_headers()
+                return
+
+        if use_gzip:
+            body = gzip.compress(body)
+            headers['Content-Encoding'] = 'gzip'
+        headers['Content-Length'] = str(len(body))
+
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def not_modified(self, etag: str, last_modified) -> bool:
+        """Check If-None-Match, falling back to If-Modified-Since."""
+        if_none_match = self.headers.get('If-None-Match')
+        if if_none_match is not None:
+            tags = [t.strip() for t in if_none_match.split(',')]
+            return '*' in tags or etag in tags or f'W/{etag}' in tags
+
+        if_modified_since = self.headers.get('If-Modified-Since')
+        if if_modified_since and last_modified is not None:
+            try:
+                since = parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+            return int(last_modified.timestamp()) <= int(since)
+        return False
+
+
+def serve(host: str = '127.0.0.1', port: int = 8502):
+    """Run the price API until interrupted."""
+    server = ThreadingHTTPServer((host, port), PriceApiHandler)
+    print(f"Serving price API on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Serve commodity prices over HTTP")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8502)
+    args = parser.parse_args()
+    serve(args.host, args.port)
@@ -0,0 +1,185 @@
+"""
+Read-only, memory-mapped series store shared by all Streamlit worker processes.
+
+The refresh job publishes every commodity history once per host into a
+versioned directory of flat NumPy arrays. Each process maps those files
+read-only, so the OS page cache holds a single copy regardless of how many
+sessions or workers read them, and sessions receive zero-copy array views.
+"""
+
+import json
+import os
+import shutil
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+
+# Store layout:
+#   data_cache/series_store/CURRENT            -> name of the live version
+#   data_cache/series_store/v<timestamp>/dates.npy   (datetime64[ns], all series concatenated)
+#   data_cache/series_store/v<timestamp>/prices.npy  (float64, all series concatenated)
+#   data_cache/series_store/v<timestamp>/manifest.json  -> {commodity: [start, stop]}
+STORE_DIR = Path('data_cache') / 'series_store'
+CURRENT_FILE = 'CURRENT'
+MANIFEST_FILE = 'manifest.json'
+
+# Number of published versions kept on disk so readers still mapping an
+# older version are not cut off mid-request
+KEEP_VERSIONS = 2
+
+
+def publish_series(frames: dict, store_dir: Path = STORE_DIR) -> str:
+    """
+    Write a new store version and atomically make it the live one.
+
+    Args:
+        frames: Mapping of commodity name to DataFrame with date, price columns
+        store_dir: Root directory of the store
+
+    Returns:
+        Name of the published version
+    """
+    store_dir.mkdir(parents=True, exist_ok=True)
+    version = f"v{datetime.now().strftime('%Y%m%d%H%M%S%f')}"
+    tmp_dir = store_dir / f".{version}.tmp"
+    tmp_dir.mkdir()
+
+    manifest = {}
+    date_parts = []
+    price_parts = []
+    offset = 0
+    for commodity, df in frames.items():
+        if df is None or df.empty:
+            continue
+        df = df.sort_values('date')
+        dates = df['date'].to_numpy(dtype='datetime64[ns]')
+        prices = df['price'].to_numpy(dtype=np.float64)
+        manifest[commodity] = [offset, offset + len(dates)]
+        offset += len(dates)
+        date_parts.append(dates)
+        price_parts.append(prices)
+
+    if date_parts:
+        all_dates = np.concatenate(date_parts)
+        all_prices = np.concatenate(price_parts)
+    else:
+        all_dates = np.empty(0, dtype='datetime64[ns]')
+        all_prices = np.empty(0, dtype=np.float64)
+
+    np.save(tmp_dir / 'dates.npy', all_dates)
+    np.save(tmp_dir / 'prices.npy', all_prices)
+    with open(tmp_dir / MANIFEST_FILE, 'w') as f:
+        json.dump(manifest, f)
+
+    # Rename the finished directory into place, then swap the pointer file
+    os.replace(tmp_dir, store_dir / version)
+    pointer_tmp = store_dir / f".{CURRENT_FILE}.tmp"
+    pointer_tmp.write_text(version)
+    os.replace(pointer_tmp, store_dir / CURRENT_FILE)
+
+    _prune_versions(store_dir, version)
+    return version
+
+
+def _prune_versions(store_dir: Path, current: str):
+    """Remove old versions beyond KEEP_VERSIONS, never touching the live one."""
+    versions = sorted(p for p in store_dir.iterdir() if p.is_dir() and p.name.startswith('v'))
+    for path in versions[:-KEEP_VERSIONS]:
+        if path.name != current:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+class SeriesStore:
+    """
+    Read-only view over the published series store.
+
+    Arrays are opened with mmap_mode='r', so every process on the host shares
+    the same physical pages. The live version is re-checked on each lookup and
+    swapped in when the refresh job publishes a new one; published holds the
+    time the live version was written.
+    """
+
+    def __init__(self, store_dir: Path = STORE_DIR):
+        self.store_dir = Path(store_dir)
+        self.version = None
+        self.published = None
+        self._manifest = {}
+        self._dates = None
+        self._prices = None
+
+    def _refresh(self):
+        """Map the live version if the CURRENT pointer names a new one."""
+        # Compare the version name itself; pointer timestamps can be too coarse
+        # to tell apart two publishes in quick succession
+        try:
+            version = (self.store_dir / CURRENT_FILE).read_text().strip()
+        except FileNotFoundError:
+            return
+        if version == self.version:
+            return
+
+        version_dir = self.store_dir / version
+        try:
+            with open(version_dir / MANIFEST_FILE) as f:
+                manifest = json.load(f)
+            dates = np.load(version_dir / 'dates.npy', mmap_mode='r')
+            prices = np.load(version_dir / 'prices.npy', mmap_mode='r')
+        except (OSError, ValueError):
+            # Keep serving the previous version if the new one is unreadable
+            return
+
+        self._manifest = manifest
+        self._dates = dates
+        self._prices = prices
+        self.version = version
+        self.published = datetime.fromtimestamp((version_dir / MANIFEST_FILE).stat().st_mtime)
+
+    def has(self, commodity: str) -> bool:
+        """Return True if the live version contains the commodity."""
+        self._refresh()
+        return commodity in self._manifest
+
+    def get_arrays(self, commodity: str):
+        """
+        Get zero-copy views of a commodity's full history.
+
+        Args:
+            commodity: Commodity name (e.g., 'copper')
+
+        Returns:
+            Tuple of (dates, prices) read-only arrays, or None if not stored
+        """
+        self._refresh()
+        bounds = self._manifest.get(commodity)
+        if bounds is None:
+            return None
+        start, stop = bounds
+        return self._dates[start:stop], self._prices[start:stop]
+
+    def get_frame(self, commodity: str, start_date: datetime, end_date: datetime) -> pd.DataFrame:
+        """
+        Get a commodity's history between two dates as a DataFrame.
+
+        Args:
+            commodity: Commodity name (e.g., 'copper')
+            start_date: Start date as datetime object
+            end_date: End date as datetime object
+
+        Returns:
+            DataFrame with columns: date, price, or empty DataFrame if not stored
+        """
+        arrays = self.get_arrays(commodity)
+        if arrays is None:
+            return pd.DataFrame()
+        dates, prices = arrays
+
+        # Dates are sorted, so the window is a contiguous slice
+        lo = np.searchsorted(dates, np.datetime64(pd.Timestamp(start_date), 'ns'), side='left')
+        hi = np.searchsorted(dates, np.datetime64(pd.Timestamp(end_date), 'ns'), side='right')
+        if lo >= hi:
+            return pd.DataFrame()
+        # copy=False keeps both columns as views of the mapped file
+        return pd.DataFrame({'date': dates[lo:hi], 'price': prices[lo:hi]}, copy=False)
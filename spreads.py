@@ -0,0 +1,135 @@
+"""
+Synthetic instruments (spreads and ratios) built from exchange symbols.
+
+Formulas are plain arithmetic over COMMODITY_MAP symbols, e.g. 'cu / al' or
+'rb - 1.6 * i - 0.5 * j'. Each formula is parsed and validated once, then
+evaluated as a vectorized NumPy expression over calendar-aligned series.
+"""
+
+import ast
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+
+# Predefined synthetic instruments, shown alongside real commodities
+# Weights follow common industry rules of thumb (per ton of output)
+# 'unit' is 'RMB' for spreads and 'ratio' for dimensionless ratios
+SYNTHETIC_MAP = {
+    'steel_mill_margin': {
+        'formula': 'rb - 1.6 * i - 0.5 * j',
+        'name': 'Steel Mill Margin (rb - 1.6i - 0.5j)',
+        'category': 'Spreads & Ratios',
+        'unit': 'RMB',
+    },
+    'soybean_crush': {
+        'formula': '0.785 * m + 0.185 * y - a',
+        'name': 'Soybean Crush Margin (m + y - a)',
+        'category': 'Spreads & Ratios',
+        'unit': 'RMB',
+    },
+    'copper_aluminum_ratio': {
+        'formula': 'cu / al',
+        'name': 'Copper/Aluminum Ratio',
+        'category': 'Spreads & Ratios',
+        'unit': 'ratio',
+    },
+    # sc trades per barrel, fu/lu per ton (~6.35 barrels per ton of fuel oil)
+    'fuel_oil_crack': {
+        'formula': 'fu / 6.35 - sc',
+        'name': 'Fuel Oil Crack (fu - sc)',
+        'category': 'Spreads & Ratios',
+        'unit': 'RMB',
+    },
+    'low_sulfur_fuel_oil_crack': {
+        'formula': 'lu / 6.35 - sc',
+        'name': 'Low Sulfur Fuel Oil Crack (lu - sc)',
+        'category': 'Spreads & Ratios',
+        'unit': 'RMB',
+    },
+}
+
+_ALLOWED_NODES = (
+    ast.Expression, ast.BinOp, ast.UnaryOp, ast.Name, ast.Load, ast.Constant,
+    ast.Add, ast.Sub, ast.Mult, ast.Div, ast.USub, ast.UAdd,
+)
+
+
+class FormulaError(ValueError):
+    """Raised when a synthetic instrument formula is invalid."""
+
+
+class Formula:
+    """A parsed, validated formula ready for vectorized evaluation."""
+
+    def __init__(self, text: str, symbols: tuple, code):
+        self.text = text
+        self.symbols = symbols
+        self._code = code
+
+    def evaluate(self, series: dict) -> pd.DataFrame:
+        """
+        Evaluate the formula over component price series.
+
+        Args:
+            series: Mapping of symbol to DataFrame with date, price columns
+
+        Returns:
+            DataFrame with columns: date, price on the dates common to all
+            components, or empty DataFrame if any component is missing
+        """
+        columns = []
+        for symbol in self.symbols:
+            df = series.get(symbol)
+            if df is None or df.empty:
+                return pd.DataFrame()
+            columns.append(df.set_index('date')['price'].rename(symbol))
+
+        # Align on the trading calendar shared by every component
+        aligned = pd.concat(columns, axis=1, join='inner').sort_index()
+        if aligned.empty:
+            return pd.DataFrame()
+
+        arrays = {symbol: aligned[symbol].to_numpy(dtype=np.float64) for symbol in self.symbols}
+        with np.errstate(divide='ignore', invalid='ignore'):
+            values = eval(self._code, {'__builtins__': {}}, arrays)
+        values = np.broadcast_to(np.asarray(values, dtype=np.float64), len(aligned))
+
+        result = pd.DataFrame({'date': aligned.index, 'price': values})
+        result = result[np.isfinite(result['price'])]
+        return result.reset_index(drop=True)
+
+
+@lru_cache(maxsize=256)
+def parse_formula(text: str, valid_symbols: frozenset) -> Formula:
+    """
+    Parse and validate a formula once.
+
+    Args:
+        text: Arithmetic expression over exchange symbols (e.g., 'cu / al')
+        valid_symbols: Symbols the formula may reference
+
+    Returns:
+        Parsed Formula
+    """
+    try:
+        tree = ast.parse(text.strip(), mode='eval')
+    except SyntaxError as e:
+        raise FormulaError(f"Invalid formula '{text}': {e.msg}")
+
+    symbols = []
+    for node in ast.walk(tree):
+        if not isinstance(node, _ALLOWED_NODES):
+            raise FormulaError(f"Unsupported expression in formula '{text}'")
+        if isinstance(node, ast.Constant) and (isinstance(node.value, bool) or not isinstance(node.value, (int, float))):
+            raise FormulaError(f"Only numeric constants are allowed in formula '{text}'")
+        if isinstance(node, ast.Name):
+            if node.id not in valid_symbols:
+                raise FormulaError(f"Unknown symbol '{node.id}' in formula '{text}'")
+            if node.id not in symbols:
+                symbols.append(node.id)
+
+    if not symbols:
+        raise FormulaError(f"Formula '{text}' does not reference any symbol")
+    return Formula(text, tuple(symbols), compile(tree, '<formula>', 'eval'))
@@ -0,0 +1,13 @@
+import sys
+import types
+from pathlib import Path
+
+# Modules live at the repository root
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# Tests never reach the network; provide a placeholder when akshare is absent
+# so data_fetcher can be imported, and patch its functions per test
+try:
+    import akshare  # noqa: F401
+except ImportError:
+    sys.modules['akshare'] = types.ModuleType('akshare')
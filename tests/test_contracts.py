@@ -0,0 +1,125 @@
+from datetime import date
+
+import pandas as pd
+import pytest
+
+from contracts import (
+    ContractChain,
+    ContractFetchAborted,
+    build_continuous,
+    candidate_contracts,
+    parse_listed_contracts,
+)
+from fetch_guard import FetchGuard
+
+TODAY = date(2024, 6, 15)
+
+
+def bars(prices):
+    return pd.DataFrame({
+        'date': pd.date_range('2024-01-02', periods=len(prices)),
+        'close': prices,
+        'volume': 10.0,
+        'hold': 100.0,
+    })
+
+
+def test_parse_listed_contracts_groups_by_symbol():
+    listed = parse_listed_contracts(['A2409', 'a2411', 'm2409', 'SR409', 'bad'])
+
+    assert listed == {'a': ['a2409', 'a2411'], 'm': ['m2409']}
+
+
+def test_candidates_follow_listed_delivery_months():
+    listed = ['a2407', 'a2409', 'a2411', 'a2501', 'a2503', 'a2505']
+    codes = candidate_contracts('a', TODAY, listed)
+
+    # Expired contracts only in the odd months the exchange lists for soybeans
+    assert 'a2405' in codes and 'a1807' in codes
+    assert 'a2406' not in codes and 'a2404' not in codes
+    assert codes[-6:] == listed
+
+
+def test_candidates_empty_without_listing():
+    assert candidate_contracts('wr', TODAY, []) == []
+
+
+def test_expired_contracts_without_data_are_recorded_missing(tmp_path):
+    chain = ContractChain('a', cache_dir=tmp_path)
+    listed = ['a2407', 'a2409']
+
+    def fetch(code):
+        if code in listed:
+            return bars([4000.0, 4010.0])
+        if code == 'a2309':
+            raise ValueError('rate limited')
+        return pd.DataFrame()
+
+    chain.update(fetch, listed, today=TODAY)
+
+    # Only the contract that errored is fetched again
+    assert chain.contracts_to_fetch(TODAY, listed) == ['a2309']
+    assert sorted(chain.load()['contract'].unique()) == listed
+
+
+def test_update_stops_when_breaker_opens(tmp_path):
+    chain = ContractChain('au', cache_dir=tmp_path)
+    guard = FetchGuard(timeout=1)
+    listed = ['au2408', 'au2410', 'au2412']
+
+    def failing(code):
+        raise ConnectionError('upstream down')
+
+    with pytest.raises(ContractFetchAborted):
+        chain.update(lambda code: guard.call('sina', code, failing, code), listed, today=TODAY, max_workers=1)
+
+    # Contracts that failed during the outage, listed or expired, are retried next time
+    assert set(listed) <= set(chain.contracts_to_fetch(TODAY, listed))
+    assert chain._load_meta()['missing'] == []
+
+
+def chain_frame(contracts):
+    """Build a long-format chain from {code: (start, prices, volume)}."""
+    parts = []
+    for code, (start, prices, volume) in contracts.items():
+        parts.append(pd.DataFrame({
+            'contract': code,
+            'date': pd.date_range(start, periods=len(prices)),
+            'price': prices,
+            'volume': volume,
+            'open_interest': volume,
+        }))
+    return pd.concat(parts, ignore_index=True)
+
+
+def test_back_adjustment_when_outgoing_contract_stopped_trading():
+    # Volume stays in rr2402 until its last day; rr2403 only starts trading after
+    chain = chain_frame({
+        'rr2402': ('2024-01-01', [100.0] * 5, 50.0),
+        'rr2403': ('2024-01-06', [150.0] * 5, 10.0),
+    })
+
+    back = build_continuous(chain, 'volume', 'back')
+    ratio = build_continuous(chain, 'volume', 'ratio')
+
+    assert back['contract'].tolist() == ['rr2402'] * 5 + ['rr2403'] * 5
+    assert back['price'].tolist() == [150.0] * 10
+    assert ratio['price'].tolist() == pytest.approx([150.0] * 10)
+
+
+def test_calendar_roll_skips_illiquid_months_and_falls_forward():
+    chain = chain_frame({
+        # Liquid front month stops trading early, before its scheduled roll date
+        'rr2402': ('2024-01-01', [100.0] * 10, 50.0),
+        # Off-month that barely trades
+        'rr2403': ('2024-01-05', [120.0] * 2, 1.0),
+        'rr2405': ('2024-01-01', [110.0] * 40, 20.0),
+    })
+    chain.loc[(chain['contract'] == 'rr2405') & (chain['date'] > '2024-01-10'), 'volume'] = 80.0
+
+    result = build_continuous(chain, 'calendar', 'back')
+
+    assert 'rr2403' not in set(result['contract'])
+    assert result['date'].iloc[-1] == pd.Timestamp('2024-02-09')
+    assert result['contract'].iloc[-1] == 'rr2405'
+    assert result['price'].tolist() == [110.0] * 40
@@ -0,0 +1,126 @@
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+import data_fetcher
+from fetch_guard import BREAKER_THRESHOLD, FetchGuard
+from series_store import SeriesStore, publish_series
+
+
+@pytest.fixture
+def sina(monkeypatch, tmp_path):
+    """Replace the akshare Sina endpoint and give each test a fresh guard and cache."""
+    calls = []
+    bars = pd.DataFrame({
+        'date': ['2024-01-02', '2024-01-03', '2024-01-04'],
+        'close': [68000.0, 68500.0, 69000.0],
+    })
+
+    def futures_zh_daily_sina(symbol):
+        calls.append(symbol)
+        return bars.copy()
+
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'data_cache').mkdir()
+    monkeypatch.setattr(data_fetcher.ak, 'futures_zh_daily_sina', futures_zh_daily_sina, raising=False)
+    guard = FetchGuard(timeout=5)
+    monkeypatch.setattr(data_fetcher, 'get_fetch_guard', lambda: guard)
+    monkeypatch.setattr(data_fetcher, 'get_series_store', lambda: SeriesStore(tmp_path / 'store'))
+    data_fetcher.fetch_formula_data.clear()
+    data_fetcher._load_history_cache.clear()
+    return calls
+
+
+def test_fetch_sina_daily_requests_main_contract(sina):
+    df = data_fetcher.fetch_sina_daily('cu')
+
+    assert sina == ['cu0']
+    assert len(df) == 3
+
+
+def test_fetch_commodity_data_goes_through_guard(sina):
+    df = data_fetcher.fetch_commodity_data('copper', datetime(2024, 1, 1), datetime(2024, 1, 31), use_cache=False)
+
+    assert sina == ['cu0']
+    assert df['price'].tolist() == [68000.0, 68500.0, 69000.0]
+
+
+def test_fetch_contract_bars_requests_contract(sina):
+    data_fetcher.fetch_contract_bars('cu2401')
+
+    assert sina == ['cu2401']
+
+
+def test_synthetic_legs_are_never_roll_adjusted(sina, monkeypatch, tmp_path):
+    # Copper has a back-adjusted series; aluminum only has the main contract
+    publish_series({'copper': pd.DataFrame({
+        'date': pd.to_datetime(['2024-01-02', '2024-01-03', '2024-01-04']),
+        'price': [60000.0, 60500.0, 61000.0],
+    })}, tmp_path / 'back')
+    monkeypatch.setattr(data_fetcher, 'get_continuous_store', lambda adjustment: SeriesStore(tmp_path / adjustment))
+
+    window = data_fetcher.fetch_commodity_data('copper_aluminum_ratio', datetime(2024, 1, 1), datetime(2024, 1, 31),
+                                               adjustment='back')
+    history = data_fetcher.fetch_commodity_history('copper_aluminum_ratio', adjustment='back')
+
+    assert window['price'].tolist() == [1.0, 1.0, 1.0]
+    assert history['price'].tolist() == [1.0, 1.0, 1.0]
+
+
+def listing(codes):
+    return pd.DataFrame({'合约代码': codes})
+
+
+def test_listing_steps_back_over_holidays_without_opening_breaker(sina, monkeypatch):
+    requested = []
+
+    def futures_contract_info_shfe(date):
+        requested.append(date)
+        if len(requested) <= BREAKER_THRESHOLD + 1:
+            raise KeyError('no listing on a non-trading day')
+        return listing(['cu2501', 'cu2502'])
+
+    monkeypatch.setattr(data_fetcher.ak, 'futures_contract_info_shfe', futures_contract_info_shfe, raising=False)
+
+    assert data_fetcher.fetch_listed_contracts('SHFE') == {'cu': ['cu2501', 'cu2502']}
+    assert all(datetime.strptime(day, '%Y%m%d').weekday() < 5 for day in requested)
+    assert data_fetcher.get_fetch_guard().status('exchange', 'dce_contracts') is None
+
+
+def test_refresh_builds_chains_for_ine_contracts(sina, monkeypatch, caplog):
+    monkeypatch.setattr(data_fetcher.ak, 'futures_contract_info_shfe', lambda date: listing(['cu2601']),
+                        raising=False)
+    monkeypatch.setattr(data_fetcher.ak, 'futures_contract_info_ine', lambda date: listing(['sc2601']),
+                        raising=False)
+    monkeypatch.setattr(data_fetcher.ak, 'futures_contract_info_dce', lambda: listing(['a2601']), raising=False)
+
+    data_fetcher.refresh_continuous_store()
+
+    store = SeriesStore(data_fetcher.CONTINUOUS_STORE_DIR / 'back')
+    assert store.has('crude_oil') and store.has('copper') and store.has('soybean')
+    assert 'gold' in caplog.text and 'crude_oil' not in caplog.text
+
+
+def test_synthetic_fetch_goes_through_sina(sina):
+    df = data_fetcher.fetch_commodity_data('steel_mill_margin', datetime(2024, 1, 1), datetime(2024, 1, 31))
+
+    assert sorted(sina) == ['i0', 'j0', 'rb0']
+    # Every leg returns the same bars, so the margin is (1 - 1.6 - 0.5) * price
+    assert df['price'].tolist() == pytest.approx([-1.1 * p for p in [68000.0, 68500.0, 69000.0]])
+
+
+def test_store_backed_fetch_returns_read_only_view(sina, tmp_path):
+    publish_series({'copper': pd.DataFrame({
+        'date': pd.to_datetime(['2024-01-02', '2024-01-03']),
+        'price': [70000.0, 70500.0],
+    })}, tmp_path / 'store')
+
+    df = data_fetcher.fetch_commodity_data('copper', datetime(2024, 1, 1), datetime(2024, 1, 31))
+
+    assert sina == []
+    assert df['price'].tolist() == [70000.0, 70500.0]
+    with pytest.raises(ValueError, match='read-only'):
+        df.loc[0, 'price'] = 1.0
+    df = df.copy()
+    df.loc[0, 'price'] = 1.0
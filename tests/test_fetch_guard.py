@@ -0,0 +1,104 @@
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+import fetch_guard
+from fetch_guard import BREAKER_THRESHOLD, FetchGuard, SourceUnavailable, UpstreamUnavailable
+
+
+def test_empty_result_is_negatively_cached():
+    guard = FetchGuard(timeout=1)
+    guard.call('sina', 'wr', lambda: pd.DataFrame())
+
+    with pytest.raises(UpstreamUnavailable):
+        guard.call('sina', 'wr', lambda: pd.DataFrame({'close': [1.0]}))
+    assert 'no data returned' in guard.status('sina', 'wr')
+
+
+def test_breaker_opens_after_repeated_errors():
+    guard = FetchGuard(timeout=1)
+
+    def fail():
+        raise RuntimeError('upstream error')
+
+    for i in range(BREAKER_THRESHOLD):
+        with pytest.raises(RuntimeError):
+            guard.call('sina', f"s{i}", fail)
+
+    with pytest.raises(UpstreamUnavailable):
+        guard.call('sina', 'cu', lambda: pd.DataFrame({'close': [1.0]}))
+
+
+def test_hung_calls_do_not_block_other_symbols():
+    guard = FetchGuard(timeout=0.2)
+    release = threading.Event()
+
+    def hang():
+        release.wait(5)
+        return pd.DataFrame()
+
+    try:
+        for symbol in ['wr', 'rr', 'fb', 'bb']:
+            with pytest.raises(TimeoutError):
+                guard.call('sina', symbol, hang)
+
+        started = time.monotonic()
+        for symbol in ['cu', 'al', 'zn']:
+            df = guard.call('sina', symbol, lambda: pd.DataFrame({'close': [1.0]}))
+            assert len(df) == 1
+        assert time.monotonic() - started < 0.2
+        assert guard.status('sina', 'cu') is None
+    finally:
+        release.set()
+
+
+def test_concurrent_callers_share_one_request():
+    guard = FetchGuard(timeout=2)
+    calls = []
+
+    def slow():
+        calls.append(1)
+        time.sleep(0.1)
+        return pd.DataFrame({'close': [1.0]})
+
+    threads = [threading.Thread(target=guard.call, args=('sina', 'cu', slow)) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+
+
+def test_breaker_recovers_when_first_call_after_cooldown_hits_hung_key(monkeypatch):
+    monkeypatch.setattr(fetch_guard, 'BACKOFF_BASE', 0.05)
+    monkeypatch.setattr(fetch_guard, 'BREAKER_COOLDOWN', 0.05)
+    guard = FetchGuard(timeout=0.2)
+    release = threading.Event()
+
+    def fail():
+        raise RuntimeError('upstream error')
+
+    try:
+        with pytest.raises(TimeoutError):
+            guard.call('sina', 'wr', lambda: release.wait(5))
+        for i in range(BREAKER_THRESHOLD - 1):
+            with pytest.raises(RuntimeError):
+                guard.call('sina', f"s{i}", fail)
+        with pytest.raises(SourceUnavailable):
+            guard.call('sina', 'cu', lambda: pd.DataFrame({'close': [1.0]}))
+
+        time.sleep(0.1)
+        # The hung request is still pending, so this caller never probes the source
+        with pytest.raises(UpstreamUnavailable) as excinfo:
+            guard.call('sina', 'wr', lambda: pd.DataFrame({'close': [1.0]}))
+        assert not isinstance(excinfo.value, SourceUnavailable)
+        assert excinfo.value.retry_in == pytest.approx(0.1, abs=0.02)
+
+        df = guard.call('sina', 'cu', lambda: pd.DataFrame({'close': [1.0]}))
+        assert len(df) == 1
+        assert guard.status('sina', 'al') is None
+    finally:
+        release.set()
@@ -0,0 +1,111 @@
+import json
+import os
+import threading
+import urllib.request
+from http.server import ThreadingHTTPServer
+
+import pandas as pd
+import pytest
+
+import data_fetcher
+import price_api
+from fetch_guard import FetchGuard
+from series_store import MANIFEST_FILE, SeriesStore, publish_series
+
+
+@pytest.fixture
+def api(monkeypatch, tmp_path):
+    """Serve the API on a free port against a mocked akshare and empty stores."""
+    calls = []
+    bars = pd.DataFrame({
+        'date': pd.date_range('2023-01-02', periods=400).strftime('%Y-%m-%d'),
+        'close': [float(i) for i in range(400)],
+    })
+
+    def futures_zh_daily_sina(symbol):
+        calls.append(symbol)
+        return bars.copy()
+
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'data_cache').mkdir()
+    monkeypatch.setattr(data_fetcher.ak, 'futures_zh_daily_sina', futures_zh_daily_sina, raising=False)
+    guard = FetchGuard(timeout=5)
+    monkeypatch.setattr(data_fetcher, 'get_fetch_guard', lambda: guard)
+    monkeypatch.setattr(data_fetcher, 'get_series_store', lambda: SeriesStore(tmp_path / 'store'))
+    continuous = {adjustment: SeriesStore(tmp_path / adjustment) for adjustment in ('back', 'ratio')}
+    monkeypatch.setattr(data_fetcher, 'get_continuous_store', lambda adjustment: continuous[adjustment])
+    data_fetcher._load_history_cache.clear()
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), price_api.PriceApiHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}", calls, tmp_path
+    server.shutdown()
+    server.server_close()
+
+
+def get(url, headers=None):
+    request = urllib.request.Request(url, headers=headers or {})
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status, dict(response.headers), response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, dict(e.headers), e.read()
+
+
+def test_windows_are_cut_from_one_cached_history(api):
+    base, calls, tmp_path = api
+
+    status, _, body = get(f"{base}/series/copper?start=2023-01-02&end=2023-01-04")
+    assert status == 200
+    assert json.loads(body)['copper']['price'] == [0.0, 1.0, 2.0]
+
+    status, _, body = get(f"{base}/series/copper?start=2023-02-01&end=2023-02-02")
+    assert json.loads(body)['copper']['price'] == [30.0, 31.0]
+
+    assert calls == ['cu0']
+    assert [p.name for p in (tmp_path / 'data_cache').iterdir()] == ['copper_full.csv']
+
+
+def test_etag_revalidation_returns_not_modified(api):
+    base, _, _ = api
+
+    status, headers, _ = get(f"{base}/series/copper?start=2023-01-02&end=2023-03-01")
+    assert status == 200
+
+    status, _, body = get(f"{base}/series/copper?start=2023-01-02&end=2023-03-01",
+                          {'If-None-Match': headers['ETag']})
+    assert status == 304
+    assert body == b''
+
+
+def test_last_modified_follows_republish_not_last_date(api):
+    base, _, tmp_path = api
+    dates = pd.date_range('2024-01-01', periods=3)
+    url = f"{base}/series/copper?start=2024-01-01&end=2024-01-03&adjustment=back"
+
+    first = publish_series({'copper': pd.DataFrame({'date': dates, 'price': [1.0, 2.0, 3.0]})}, tmp_path / 'back')
+    os.utime(tmp_path / 'back' / first / MANIFEST_FILE, (1_700_000_000, 1_700_000_000))
+    status, headers, _ = get(url)
+    assert status == 200
+
+    # Republishing shifts the adjusted history but keeps the same last date
+    second = publish_series({'copper': pd.DataFrame({'date': dates, 'price': [5.0, 6.0, 7.0]})}, tmp_path / 'back')
+    os.utime(tmp_path / 'back' / second / MANIFEST_FILE, (1_700_000_100, 1_700_000_100))
+    status, _, body = get(url, {'If-Modified-Since': headers['Last-Modified']})
+    assert status == 200
+    assert json.loads(body)['copper']['price'] == [5.0, 6.0, 7.0]
+
+
+def test_gzip_response_has_its_own_etag(api):
+    base, _, _ = api
+    url = f"{base}/series/copper?start=2023-01-02&end=2023-12-31"
+
+    _, plain, _ = get(url)
+    _, compressed, _ = get(url, {'Accept-Encoding': 'gzip'})
+    assert compressed['Content-Encoding'] == 'gzip'
+    assert compressed['ETag'] != plain['ETag']
+
+    status, headers, _ = get(url, {'Accept-Encoding': 'gzip', 'If-None-Match': compressed['ETag']})
+    assert status == 304
+    assert headers['Vary'] == 'Accept-Encoding'
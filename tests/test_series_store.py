@@ -0,0 +1,48 @@
+import os
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from series_store import CURRENT_FILE, SeriesStore, publish_series
+
+
+def frame(prices):
+    return pd.DataFrame({'date': pd.date_range('2024-01-01', periods=len(prices)), 'price': prices})
+
+
+def test_get_frame_is_zero_copy_view(tmp_path):
+    publish_series({'copper': frame([1.0, 2.0, 3.0, 4.0])}, tmp_path)
+    store = SeriesStore(tmp_path)
+
+    df = store.get_frame('copper', datetime(2024, 1, 2), datetime(2024, 1, 3, 23, 59))
+    dates, prices = store.get_arrays('copper')
+
+    assert df['price'].tolist() == [2.0, 3.0]
+    assert np.shares_memory(df['price'].to_numpy(), prices)
+    assert np.shares_memory(df['date'].to_numpy(), dates)
+
+
+def test_new_version_is_swapped_in(tmp_path):
+    publish_series({'copper': frame([1.0, 2.0])}, tmp_path)
+    store = SeriesStore(tmp_path)
+    first = store.get_frame('copper', datetime(2024, 1, 1), datetime(2024, 1, 2))
+
+    publish_series({'copper': frame([5.0, 6.0])}, tmp_path)
+    second = store.get_frame('copper', datetime(2024, 1, 1), datetime(2024, 1, 2))
+
+    assert first['price'].tolist() == [1.0, 2.0]
+    assert second['price'].tolist() == [5.0, 6.0]
+
+
+def test_swap_detected_when_pointer_mtime_unchanged(tmp_path):
+    publish_series({'copper': frame([1.0, 2.0])}, tmp_path)
+    store = SeriesStore(tmp_path)
+    store.has('copper')
+    mtime = (tmp_path / CURRENT_FILE).stat().st_mtime_ns
+
+    # Simulate a filesystem whose timestamps cannot tell the two publishes apart
+    publish_series({'copper': frame([5.0, 6.0])}, tmp_path)
+    os.utime(tmp_path / CURRENT_FILE, ns=(mtime, mtime))
+
+    assert store.get_frame('copper', datetime(2024, 1, 1), datetime(2024, 1, 2))['price'].tolist() == [5.0, 6.0]
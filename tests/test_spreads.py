@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from spreads import FormulaError, parse_formula
+
+SYMBOLS = frozenset({'cu', 'al', 'rb', 'i', 'j'})
+
+
+def series(dates, prices):
+    return pd.DataFrame({'date': pd.to_datetime(dates), 'price': prices})
+
+
+def test_parse_collects_each_symbol_once():
+    formula = parse_formula('rb - 1.6 * i - 0.5 * j + 0 * rb', SYMBOLS)
+
+    assert sorted(formula.symbols) == ['i', 'j', 'rb']
+
+
+@pytest.mark.parametrize('text', [
+    'cu / xx',                   # unknown symbol
+    'abs(cu)',                   # call
+    'cu.real',                   # attribute
+    'cu ** 2',                   # power
+    "cu + 'a'",                  # non-numeric constant
+    'cu * True',                 # bool constant
+    '__import__("os")',          # call to a builtin
+    '1 + 2',                     # no symbol
+    'cu +',                      # syntax error
+])
+def test_parse_rejects_invalid_formulas(text):
+    with pytest.raises(FormulaError):
+        parse_formula(text, SYMBOLS)
+
+
+def test_evaluate_aligns_on_common_dates():
+    formula = parse_formula('cu / al', SYMBOLS)
+
+    result = formula.evaluate({
+        'cu': series(['2024-01-03', '2024-01-02', '2024-01-04'], [70.0, 60.0, 80.0]),
+        'al': series(['2024-01-02', '2024-01-03', '2024-01-05'], [20.0, 35.0, 40.0]),
+    })
+
+    assert result['date'].tolist() == list(pd.to_datetime(['2024-01-02', '2024-01-03']))
+    assert result['price'].tolist() == [3.0, 2.0]
+
+
+def test_evaluate_drops_non_finite_values():
+    formula = parse_formula('cu / al', SYMBOLS)
+
+    result = formula.evaluate({
+        'cu': series(['2024-01-02', '2024-01-03', '2024-01-04'], [60.0, 0.0, 80.0]),
+        'al': series(['2024-01-02', '2024-01-03', '2024-01-04'], [0.0, 0.0, 40.0]),
+    })
+
+    assert result['price'].tolist() == [2.0]
+    assert np.isfinite(result['price']).all()
+
+
+def test_evaluate_returns_empty_when_a_leg_is_missing():
+    formula = parse_formula('cu / al', SYMBOLS)
+
+    assert formula.evaluate({'cu': series(['2024-01-02'], [60.0])}).empty